@@ -1,16 +1,55 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
+from werkzeug.http import is_resource_modified
 import boto3
+import functools
 import os
+import shutil
 import tempfile
+import threading
 import json
-from utils.file_handlers import get_file_preview, is_supported_type
+import orjson
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import quote
+from utils.file_handlers import PREVIEW_IMAGE_MIME, get_extension, get_file_preview, get_file_type, is_supported_type, render_image_preview
+from cachetools import LRUCache, TTLCache
 from botocore import UNSIGNED
+from botocore.exceptions import ClientError
 from botocore.config import Config
 
+# JSON provider backed by orjson, which serializes datetimes natively and is
+# considerably faster than the standard library encoder for large listings
+class OrjsonProvider(JSONProvider):
+    OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return self.dumpb(obj).decode('utf-8')
+
+    def dumpb(self, obj):
+        """Serialize obj to JSON bytes, skipping the round trip through str"""
+        return orjson.dumps(obj, default=str, option=self.OPTIONS)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj), mimetype='application/json')
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
+# Compress JSON responses (listings are large and highly repetitive); file
+# downloads are streamed through as-is, even when the object itself is JSON
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
+
 # Helper function to ensure endpoint has protocol
 def ensure_endpoint_has_protocol(endpoint_url):
     """Ensure the endpoint URL has a protocol (http:// or https://)"""
@@ -25,21 +64,133 @@ config = {
     'bucket_name': ''
 }
 
-# Function to create S3 client using the in-memory config
-def get_s3_client():
-    endpoint = ensure_endpoint_has_protocol(config.get('endpoint_url'))
+# Size of the per-client connection pool; connections needed beyond this
+# (e.g. bursts of concurrent gevent requests) are opened on demand but not
+# kept alive afterwards
+MAX_POOL_CONNECTIONS = 64
+
+# Number of entries returned per /api/list page; this is the S3 maximum, as
+# every ListObjectsV2 call costs a round trip regardless of its size.
+# Clients may ask for smaller pages with max_keys
+LIST_PAGE_SIZE = 1000
+
+# Number of sub-prefixes listed concurrently by /api/list_recursive; bounded
+# by the connection pool so workers never wait on a free connection
+RECURSIVE_LIST_WORKERS = min(16, MAX_POOL_CONNECTIONS)
+
+# Chunk size used when streaming downloads from S3 to the client (1MB)
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Previews of files smaller than this are read into memory rather than
+# spooled to a temporary file (8MB)
+IN_MEMORY_PREVIEW_SIZE = 8 * 1024 * 1024
+
+# Files larger than this can be downloaded but not previewed (100MB)
+MAX_PREVIEW_SIZE = 104857600
+
+# Seconds browsers may reuse preview and file info responses before
+# revalidating them with If-None-Match
+CACHE_MAX_AGE = 60
+
+# Encoded preview responses keyed by object version, bounded by total size
+PREVIEW_CACHE_SIZE = 64 * 1024 * 1024
+preview_cache = LRUCache(maxsize=PREVIEW_CACHE_SIZE, getsizeof=len)
+
+# Larger previews are not cached; LRUCache rejects entries over its maxsize,
+# and a single huge preview would evict most of the others anyway
+MAX_CACHED_PREVIEW_SIZE = PREVIEW_CACHE_SIZE // 8
+preview_cache_lock = threading.Lock()
+
+# S3 ETag of the most recently cached preview of each object and variant,
+# used to ask S3 for a bodiless 304 before serving the cached preview
+preview_source_etags = LRUCache(maxsize=4096)
+
+# Recently fetched /api/list pages, keyed by endpoint, bucket, prefix and
+# continuation token; entries expire after LIST_CACHE_TTL seconds
+LIST_CACHE_TTL = 30
+list_cache = TTLCache(maxsize=1024, ttl=LIST_CACHE_TTL)
+list_cache_lock = threading.Lock()
+
+# Background read-ahead of the next /api/list page; in-flight fetches are
+# tracked by cache key so they are neither duplicated nor repeated
+prefetch_executor = ThreadPoolExecutor(max_workers=8)
+list_prefetches = {}
+
+# Cached S3 client factory so requests share one client (and its connection
+# pool) per endpoint instead of rebuilding boto3 clients on every call
+@functools.lru_cache(maxsize=8)
+def _get_s3_client(endpoint_url):
     return boto3.client(
         's3',
-        endpoint_url=endpoint,
+        endpoint_url=endpoint_url,
         aws_access_key_id='', 
         aws_secret_access_key='',
-        config=Config(signature_version=UNSIGNED)
+        config=Config(
+            signature_version=UNSIGNED,
+            max_pool_connections=MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True,
+            retries={'max_attempts': 3, 'mode': 'adaptive'}
+        )
     )
 
+# Function to get the S3 client for the in-memory config
+def get_s3_client():
+    endpoint = ensure_endpoint_has_protocol(config.get('endpoint_url'))
+    return _get_s3_client(endpoint)
+
 # Get the current bucket name from the in-memory config
 def get_bucket_name():
     return config.get('bucket_name')
 
+# Establish the TLS connection to a newly configured endpoint in the
+# background so the first listing does not pay for the handshake
+def warm_s3_connection(endpoint_url, bucket_name):
+    if not endpoint_url or not bucket_name:
+        return
+    
+    def warm():
+        try:
+            _get_s3_client(endpoint_url).head_bucket(Bucket=bucket_name)
+        except Exception as e:
+            # Any response (even an error) leaves a pooled connection behind
+            print(f"Error warming S3 connection: {str(e)}")
+    
+    threading.Thread(target=warm, daemon=True).start()
+
+# Encoded GET /api/config response, rebuilt only after the config changes
+config_body = None
+config_lock = threading.RLock()
+
+# Get the encoded config with sensitive values masked for the frontend
+def get_config_body():
+    global config_body
+    
+    with config_lock:
+        if config_body is None:
+            safe_config = config.copy()
+            if 'aws_secret_access_key' in safe_config:
+                safe_config['aws_secret_access_key'] = '********' if safe_config['aws_secret_access_key'] else ''
+            config_body = app.json.dumpb(safe_config)
+        return config_body
+
+# Drop the encoded config so the next GET re-encodes it
+def invalidate_config_body():
+    global config_body
+    
+    with config_lock:
+        config_body = None
+
+# Resolve the S3 client and bucket for the current request, letting the
+# endpoint and bucket URL parameters override the in-memory config
+def resolve_s3_target():
+    endpoint_url = request.args.get('endpoint')
+    bucket_name = request.args.get('bucket')
+    
+    if endpoint_url and bucket_name:
+        return _get_s3_client(ensure_endpoint_has_protocol(endpoint_url)), bucket_name
+    
+    return get_s3_client(), get_bucket_name()
+
 @app.route('/api/config', methods=['GET', 'POST', 'DELETE'])
 def handle_config():
     global config
@@ -51,11 +202,7 @@ def handle_config():
         
         # If no endpoint or bucket in URL, return current config
         if not endpoint_url or not bucket_name:
-            # Return a copy of current config
-            safe_config = config.copy()
-            if 'aws_secret_access_key' in safe_config:
-                safe_config['aws_secret_access_key'] = '********' if safe_config['aws_secret_access_key'] else ''
-            return jsonify(safe_config)
+            return app.response_class(get_config_body(), mimetype='application/json')
         
         # Update config temporarily if parameters are provided
         temp_config = {
@@ -63,6 +210,9 @@ def handle_config():
             'bucket_name': bucket_name
         }
         
+        # The listing request follows right after, so open the connection now
+        warm_s3_connection(temp_config['endpoint_url'], bucket_name)
+        
         # Remove sensitive information (if any) for frontend purposes
         safe_config = temp_config.copy()
         if 'aws_secret_access_key' in safe_config:
@@ -82,17 +232,28 @@ def handle_config():
             new_config['endpoint_url'] = ensure_endpoint_has_protocol(new_config['endpoint_url'])
         
         # Update the in-memory config (no file persistence)
-        config.update(new_config)
+        with config_lock:
+            config.update(new_config)
+            invalidate_config_body()
+        _get_s3_client.cache_clear()
+        with list_cache_lock:
+            list_cache.clear()
+        
+        warm_s3_connection(config.get('endpoint_url'), config.get('bucket_name'))
         
         return jsonify({"message": "Configuration updated successfully", "status": "success"})
     
     elif request.method == 'DELETE':
         # Reset the configuration to default values
-        config.clear()
-        config.update({
-            'endpoint_url': '',
-            'bucket_name': ''
-        })
+        with config_lock:
+            config.clear()
+            config.update({
+                'endpoint_url': '',
+                'bucket_name': ''
+            })
+            invalidate_config_body()
+        with list_cache_lock:
+            list_cache.clear()
         return jsonify({"message": "Configuration cleared successfully", "status": "success"})
 
 @app.route('/api/list', methods=['GET'])
@@ -102,102 +263,135 @@ def list_objects():
     # Get continuation token for pagination
     continuation_token = request.args.get('continuation_token')
     
-    # Allow URL parameters to override the in-memory config
-    endpoint_url = request.args.get('endpoint')
-    bucket_name = request.args.get('bucket')
+    # Optional smaller page size, or the whole prefix in one response
+    max_keys_str = request.args.get('max_keys', '')
+    page_size = LIST_PAGE_SIZE
+    if max_keys_str.isdigit() and int(max_keys_str) > 0:
+        page_size = min(int(max_keys_str), LIST_PAGE_SIZE)
+    fetch_all = request.args.get('fetch_all') == '1'
+    
+    # Folder navigation can skip building entries for the files
+    folders_only = request.args.get('folders_only') == '1'
     
     try:
-        if endpoint_url and bucket_name:
-            # Apply the protocol fix here
-            endpoint_url = ensure_endpoint_has_protocol(endpoint_url)
-            
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=endpoint_url,
-                aws_access_key_id='', 
-                aws_secret_access_key='',
-                config=Config(signature_version=UNSIGNED)
-            )
-            current_bucket = bucket_name
-        else:
-            s3_client = get_s3_client()
-            current_bucket = get_bucket_name()
-            
-            # Return empty result if no bucket configured
-            if not current_bucket:
-                return jsonify({
-                    'currentPrefix': prefix,
-                    'folders': [],
-                    'files': []
-                })
+        s3_client, current_bucket = resolve_s3_target()
         
-        # Set up listing parameters
-        list_params = {
-            'Bucket': current_bucket,
-            'Prefix': prefix,
-            'Delimiter': '/',
-            'MaxKeys': 500  # Reduce from default 1000 to more manageable chunks
-        }
+        # Return empty result if no bucket configured
+        if not current_bucket:
+            return jsonify({
+                'currentPrefix': prefix,
+                'folders': [],
+                'files': []
+            })
         
-        # Add continuation token if provided
-        if continuation_token:
-            list_params['ContinuationToken'] = continuation_token
+        # Serve repeat listings of the same page from the short-lived cache
+        # unless the client asks for a fresh one
+        cache_key = (s3_client.meta.endpoint_url, current_bucket, prefix, continuation_token, page_size, fetch_all, folders_only)
+        result = None
+        if request.args.get('nocache') != '1':
+            with list_cache_lock:
+                result = list_cache.get(cache_key)
+                prefetch = list_prefetches.get(cache_key)
+            
+            # The page may already be on its way from a read-ahead
+            if result is None and prefetch is not None:
+                try:
+                    result = prefetch.result()
+                except Exception:
+                    result = None
         
-        # Call S3 with appropriate parameters
-        response = s3_client.list_objects_v2(**list_params)
+        if result is None:
+            result = fetch_list_page(s3_client, current_bucket, prefix, continuation_token, page_size, fetch_all, folders_only)
+            with list_cache_lock:
+                list_cache[cache_key] = result
         
-        # Extract folders and files from the S3 response
-        folders = []
-        files = []
+        # Read ahead the next page while the user looks at this one
+        if result.get('continuationToken'):
+            prefetch_list_page(s3_client, current_bucket, prefix, result['continuationToken'], page_size, folders_only)
         
-        for item in response.get('CommonPrefixes', []):
-            folder_name = item['Prefix'].rstrip('/').split('/')[-1] + '/'
-            folders.append({
-                'name': folder_name,
-                'path': item['Prefix'],
-                'type': 'folder'
-            })
+        response = jsonify(result)
+        response.cache_control.private = True
+        response.cache_control.max_age = LIST_CACHE_TTL
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/list_recursive', methods=['GET'])
+def list_objects_recursive():
+    prefix = request.args.get('prefix', '')
+    
+    try:
+        s3_client, current_bucket = resolve_s3_target()
         
-        for item in response.get('Contents', []):
-            # Skip if this key is the prefix itself or if it represents a folder
-            if item['Key'] == prefix or item['Key'].endswith('/'):
-                continue
-            
-            file_name = item['Key'].split('/')[-1]
-            file_ext = os.path.splitext(file_name)[1].lower()[1:]
-            
-            files.append({
-                'name': file_name,
-                'path': item['Key'],
-                'size': item['Size'],
-                'lastModified': item['LastModified'].isoformat(),
-                'type': 'file',
-                'extension': file_ext,
-                'supported': is_supported_type(file_ext, item['Size'])
+        # Return empty result if no bucket configured
+        if not current_bucket:
+            return jsonify({
+                'currentPrefix': prefix,
+                'files': []
             })
         
-        # Collect S3 response information for pagination
-        result = {
-            'currentPrefix': prefix,
-            'folders': folders,
-            'files': files
-        }
+        paginator = s3_client.get_paginator('list_objects_v2')
+        
+        # List the top level with a delimiter to find the sub-prefixes to fan out over
+        files = []
+        sub_prefixes = []
+        
+        for page in paginator.paginate(Bucket=current_bucket, Prefix=prefix, Delimiter='/'):
+            sub_prefixes.extend(item['Prefix'] for item in page.get('CommonPrefixes', []))
+            files.extend(
+                build_file_entry(item) for item in page.get('Contents', [])
+                if item['Key'] != prefix and not item['Key'].endswith('/')
+            )
         
-        # Add total item count info from S3
-        # KeyCount includes both files and folders
-        if 'KeyCount' in response:
-            result['keyCount'] = response['KeyCount']
+        # Walk each sub-prefix concurrently; they all share the cached client
+        executor = ThreadPoolExecutor(max_workers=RECURSIVE_LIST_WORKERS)
+        futures = [
+            (sub_prefix, executor.submit(list_prefix_files, s3_client, current_bucket, sub_prefix))
+            for sub_prefix in sub_prefixes
+        ]
         
-        # Also pass the total found count if available (may not be fully accurate for large buckets)
-        if 'MaxKeys' in response:
-            result['maxKeys'] = response['MaxKeys']
+        # Top-level files and sub-prefixes both come back in key order, so
+        # interleaving them keeps the whole listing sorted without a final sort
+        sources = sorted(
+            [(entry['path'], entry) for entry in files] + futures,
+            key=lambda source: source[0]
+        )
         
-        # Add continuation token if more results exist
-        if response.get('IsTruncated'):
-            result['continuationToken'] = response.get('NextContinuationToken')
-            result['isTruncated'] = True
+        # Stream the result so only one batch of entries is encoded at a time
+        def generate():
+            yield b'{"currentPrefix":' + app.json.dumpb(prefix) + b',"files":['
+            
+            separator = b''
+            batch = []
+            try:
+                for _, source in sources:
+                    if isinstance(source, Future):
+                        if batch:
+                            yield separator + app.json.dumpb(batch)[1:-1]
+                            separator = b','
+                        batch = []
+                        sub_files = source.result()
+                        if sub_files:
+                            yield separator + app.json.dumpb(sub_files)[1:-1]
+                            separator = b','
+                    else:
+                        batch.append(source)
+            except Exception as e:
+                # The 200 status has already been sent, so report the failed
+                # sub-prefix listing inside a still valid document
+                print(f"Error listing files under {prefix}: {str(e)}")
+                yield b'],"error":' + app.json.dumpb(str(e)) + b'}'
+                return
+            
+            if batch:
+                yield separator + app.json.dumpb(batch)[1:-1]
+            
+            yield b']}'
         
-        return jsonify(result)
+        response = Response(generate(), mimetype='application/json')
+        response.call_on_close(lambda: executor.shutdown(wait=False, cancel_futures=True))
+        return response
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -211,92 +405,97 @@ def get_file():
     file_size_str = request.args.get('size', '')
     file_size = int(file_size_str) if file_size_str and file_size_str.isdigit() else None
     
-    endpoint_url = request.args.get('endpoint')
-    bucket_name = request.args.get('bucket')
-    
     if not file_path:
         return jsonify({'error': 'File path is required'}), 400
     
     try:
-        if endpoint_url and bucket_name:
-            # Apply the protocol fix here
-            endpoint_url = ensure_endpoint_has_protocol(endpoint_url)
-            
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=endpoint_url,
-                aws_access_key_id='', 
-                aws_secret_access_key='',
-                config=Config(signature_version=UNSIGNED)
-            )
-            current_bucket = bucket_name
-        else:
-            s3_client = get_s3_client()
-            current_bucket = get_bucket_name()
+        s3_client, current_bucket = resolve_s3_target()
         
-        file_name = file_path.split('/')[-1]
-        file_ext = os.path.splitext(file_name)[1].lower()[1:]
+        file_name = file_path.rpartition('/')[2]
+        file_ext = get_extension(file_name)
         
         # For preview requests only, check file size and type
         if preview:
-            # Get file metadata only if size wasn't provided in request
-            if file_size is None:
-                try:
-                    response = s3_client.head_object(
-                        Bucket=current_bucket,
-                        Key=file_path
-                    )
-                    file_size = response.get('ContentLength', 0)
-                except Exception as e:
-                    # If head_object fails, continue and try to get the file anyway
-                    print(f"Error getting file metadata: {str(e)}")
-                    file_size = 0
-            
-            # Check if file is too large for preview (100MB = 104,857,600 bytes)
-            MAX_PREVIEW_SIZE = 104857600
-            if file_size and file_size > MAX_PREVIEW_SIZE:
-                # Format size for human-readable display
-                size_display = format_file_size(file_size)
-                return jsonify({
-                    'type': 'too_large',
-                    'preview': f'This file is {size_display}, which exceeds the preview size limit.',
-                    'size': file_size
-                })
-            
             # Special handling for archive files
-            if file_ext.lower() in ['zip', 'tar', 'gz', 'rar']:
+            if file_ext in ['zip', 'tar', 'gz', 'rar']:
                 return jsonify({
                     'type': 'zip',
                     'preview': 'Archive files cannot be previewed. Please download to view contents.',
                     'size': file_size or 0
                 })
             
-            # Create a temporary file with the correct suffix
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as temp:
-                temp_path = temp.name
+            if file_size and file_size > MAX_PREVIEW_SIZE:
+                return too_large_preview(file_size)
+            
+            # A single ranged GET returns the object's ETag and full size along
+            # with (at most) the previewable bytes, so no separate HEAD is
+            # needed; unchanged objects are answered without any body
+            early_response, obj = get_preview_source(s3_client, current_bucket, file_path, file_ext, 'application/json')
+            if early_response is not None:
+                return early_response
+            body = obj['Body']
             
-            # Download the file from S3
-            s3_client.download_file(current_bucket, file_path, temp_path)
+            try:
+                s3_etag, last_modified, file_size = get_object_validators(obj)
+                etag = preview_etag(s3_etag, file_ext)
+                
+                if file_size > MAX_PREVIEW_SIZE:
+                    return too_large_preview(file_size)
+                
+                # Previews are a pure function of the object version, so reuse
+                # one generated earlier for the same ETag
+                if s3_etag:
+                    cached_body = get_cached_preview(s3_client, current_bucket, file_path, file_ext, s3_etag)
+                    if cached_body is not None:
+                        response = app.response_class(cached_body, mimetype='application/json')
+                        return set_cache_headers(response, etag, last_modified)
+                
+                # Small files and images (which PIL decodes from a buffer just
+                # as well as from a path) are previewed straight from memory
+                if file_size < IN_MEMORY_PREVIEW_SIZE or get_file_type(file_ext) == 'image':
+                    preview_data = get_file_preview(body.read(), file_ext)
+                else:
+                    # Create a temporary file with the correct suffix
+                    temp = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}')
+                    try:
+                        with temp:
+                            shutil.copyfileobj(body, temp, DOWNLOAD_CHUNK_SIZE)
+                        
+                        # Get a preview of the file based on its type
+                        preview_data = get_file_preview(temp.name, file_ext)
+                    finally:
+                        # Clean up the temporary file even if the S3 read or
+                        # the preview fails
+                        try:
+                            os.unlink(temp.name)
+                        except FileNotFoundError:
+                            pass
+            finally:
+                body.close()
             
-            # Get a preview of the file based on its type
-            preview_data = get_file_preview(temp_path, file_ext)
+            response = jsonify(preview_data)
             
-            # Clean up the temporary file
-            os.unlink(temp_path)
+            # Errors may be transient, so only successful previews are kept
+            if s3_etag and preview_data.get('type') != 'error':
+                cache_preview(s3_client, current_bucket, file_path, file_ext, s3_etag, response.get_data())
             
-            return jsonify(preview_data)
+            return set_cache_headers(response, etag, last_modified)
         else:
-            # For direct downloads, always allow regardless of size
-            with tempfile.NamedTemporaryFile(delete=False) as temp:
-                temp_path = temp.name
-            
-            s3_client.download_file(current_bucket, file_path, temp_path)
+            # For direct downloads, always allow regardless of size and
+            # stream the object body straight through without touching disk
+            obj = s3_client.get_object(Bucket=current_bucket, Key=file_path)
+            body = obj['Body']
             
-            return send_file(
-                temp_path,
-                as_attachment=True,
-                download_name=os.path.basename(file_path)
+            response = Response(
+                body.iter_chunks(chunk_size=DOWNLOAD_CHUNK_SIZE),
+                headers={'Content-Length': str(obj['ContentLength'])},
+                mimetype=obj.get('ContentType', 'application/octet-stream')
             )
+            set_attachment_filename(response, os.path.basename(file_path))
+            
+            # Release the S3 connection even if the client disconnects early
+            response.call_on_close(body.close)
+            return response
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -305,54 +504,359 @@ def get_file():
 def get_file_info():
     file_path = request.args.get('path', '')
     
-    endpoint_url = request.args.get('endpoint')
-    bucket_name = request.args.get('bucket')
-    
     if not file_path:
         return jsonify({'error': 'File path is required'}), 400
     
+    # Listings already carry size and modification time, so when the client
+    # passes them back there is no need for a HEAD request unless the full
+    # S3 metadata is asked for with full=1
+    file_size_str = request.args.get('size', '')
+    last_modified_str = request.args.get('last_modified')
+    if file_size_str.isdigit() and last_modified_str and request.args.get('full') != '1':
+        file_name = file_path.rpartition('/')[2]
+        file_ext = get_extension(file_name)
+        file_size = int(file_size_str)
+        
+        return jsonify({
+            'name': file_name,
+            'path': file_path,
+            'size': file_size,
+            'lastModified': last_modified_str,
+            'type': 'file',
+            'extension': file_ext,
+            'supported': is_supported_type(file_ext, file_size)
+        })
+    
     try:
-        if endpoint_url and bucket_name:
-            # Apply the protocol fix here
-            endpoint_url = ensure_endpoint_has_protocol(endpoint_url)
-            
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=endpoint_url,
-                aws_access_key_id='', 
-                aws_secret_access_key='',
-                config=Config(signature_version=UNSIGNED)
-            )
-            current_bucket = bucket_name
-        else:
-            s3_client = get_s3_client()
-            current_bucket = get_bucket_name()
+        s3_client, current_bucket = resolve_s3_target()
         
         response = s3_client.head_object(
             Bucket=current_bucket,
             Key=file_path
         )
         
-        file_name = file_path.split('/')[-1]
-        file_ext = os.path.splitext(file_name)[1].lower()[1:]
+        etag = response.get('ETag', '').strip('"') or None
+        last_modified = response.get('LastModified')
+        if (etag or last_modified) and not is_resource_modified(
+            request.environ, etag=etag, last_modified=last_modified
+        ):
+            return set_cache_headers(Response(status=304), etag, last_modified)
+        
+        file_name = file_path.rpartition('/')[2]
+        file_ext = get_extension(file_name)
         file_size = response.get('ContentLength', 0)
         
         file_info = {
             'name': file_name,
             'path': file_path,
             'size': file_size,
-            'lastModified': response.get('LastModified', '').isoformat() if hasattr(response.get('LastModified', ''), 'isoformat') else '',
+            'lastModified': response.get('LastModified', ''),
             'type': 'file',
             'extension': file_ext,
             'supported': is_supported_type(file_ext, file_size),
             'metadata': {k: v for k, v in response.items() if k not in ['ResponseMetadata']}
         }
         
-        return jsonify(file_info)
+        return set_cache_headers(jsonify(file_info), etag, last_modified)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/preview/image', methods=['GET'])
+def image_preview():
+    file_path = request.args.get('path', '')
+    
+    if not file_path:
+        return jsonify({'error': 'File path is required'}), 400
+    
+    try:
+        s3_client, current_bucket = resolve_s3_target()
+        
+        early_response, obj = get_preview_source(s3_client, current_bucket, file_path, PREVIEW_IMAGE_MIME, PREVIEW_IMAGE_MIME)
+        if early_response is not None:
+            return early_response
+        body = obj['Body']
+        
+        try:
+            s3_etag, last_modified, file_size = get_object_validators(obj)
+            etag = preview_etag(s3_etag, PREVIEW_IMAGE_MIME)
+            
+            if file_size > MAX_PREVIEW_SIZE:
+                return jsonify({'error': 'File exceeds the preview size limit'}), 413
+            
+            image_data = None
+            if s3_etag:
+                image_data = get_cached_preview(s3_client, current_bucket, file_path, PREVIEW_IMAGE_MIME, s3_etag)
+            
+            if image_data is None:
+                try:
+                    image_data = render_image_preview(body.read())
+                except Exception as e:
+                    return jsonify({'error': f'Error processing image: {str(e)}'}), 422
+                
+                if s3_etag:
+                    cache_preview(s3_client, current_bucket, file_path, PREVIEW_IMAGE_MIME, s3_etag, image_data)
+        finally:
+            body.close()
+        
+        # The thumbnail is served as-is so browsers can decode it natively,
+        # without the base64 and JSON overhead of /api/file previews
+        response = Response(image_data, mimetype=PREVIEW_IMAGE_MIME)
+        return set_cache_headers(response, etag, last_modified)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Helper function to GET an object for a preview. When the client's copy or
+# the cached preview names an S3 ETag, the GET is made conditional so an
+# unchanged object comes back as a bodiless 304 and no connection is
+# dropped; returns either a ready response or the get_object result
+def get_preview_source(s3_client, bucket, key, variant, mimetype):
+    # The client's If-None-Match carries the S3 ETag its preview came from
+    suffix = preview_etag('', variant)
+    client_etag = next((
+        tag[:-len(suffix)] for tag in request.if_none_match.as_set(include_weak=True)
+        if tag.endswith(suffix) and len(tag) > len(suffix)
+    ), None)
+    
+    with preview_cache_lock:
+        cached_etag = preview_source_etags.get((s3_client.meta.endpoint_url, bucket, key, variant))
+    
+    known_etag = client_etag or cached_etag
+    obj = get_object_prefix(
+        s3_client, bucket, key, MAX_PREVIEW_SIZE,
+        if_none_match=known_etag,
+        if_modified_since=None if known_etag else request.if_modified_since
+    )
+    if obj is not None:
+        return None, obj
+    
+    # S3 reported the object unchanged since the version we asked about
+    etag = preview_etag(known_etag, variant)
+    if known_etag == client_etag:
+        return set_cache_headers(Response(status=304), etag, None), None
+    
+    cached_body = get_cached_preview(s3_client, bucket, key, variant, known_etag)
+    if cached_body is not None:
+        return set_cache_headers(app.response_class(cached_body, mimetype=mimetype), etag, None), None
+    
+    # The preview was evicted in the meantime, so fetch the object again
+    return None, get_object_prefix(s3_client, bucket, key, MAX_PREVIEW_SIZE)
+
+# Helper function to GET the first max_bytes of an object; the response
+# still reports the full object size in ContentRange. Returns None when
+# the conditions hold and S3 answers 304 Not Modified
+def get_object_prefix(s3_client, bucket, key, max_bytes, if_none_match=None, if_modified_since=None):
+    params = {'Bucket': bucket, 'Key': key}
+    if if_none_match:
+        params['IfNoneMatch'] = f'"{if_none_match}"'
+    elif if_modified_since:
+        params['IfModifiedSince'] = if_modified_since
+    
+    try:
+        try:
+            return s3_client.get_object(Range=f'bytes=0-{max_bytes - 1}', **params)
+        except ClientError as e:
+            # Empty objects cannot satisfy a range request
+            if e.response.get('Error', {}).get('Code') != 'InvalidRange':
+                raise
+            return s3_client.get_object(**params)
+    except ClientError as e:
+        if e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304:
+            return None
+        raise
+
+# Helper function to look up a preview generated earlier for an object version
+def get_cached_preview(s3_client, bucket, key, variant, s3_etag):
+    with preview_cache_lock:
+        return preview_cache.get((s3_client.meta.endpoint_url, bucket, key, s3_etag, variant))
+
+# Helper function to keep an encoded preview for later requests, remembering
+# which object version it was generated from
+def cache_preview(s3_client, bucket, key, variant, s3_etag, body):
+    if len(body) > MAX_CACHED_PREVIEW_SIZE:
+        return
+    
+    with preview_cache_lock:
+        preview_cache[(s3_client.meta.endpoint_url, bucket, key, s3_etag, variant)] = body
+        preview_source_etags[(s3_client.meta.endpoint_url, bucket, key, variant)] = s3_etag
+
+# Helper function to read the ETag, last modification time and full object
+# size from a (possibly ranged) get_object response
+def get_object_validators(obj):
+    etag = obj.get('ETag', '').strip('"') or None
+    content_range = obj.get('ContentRange')
+    file_size = int(content_range.rpartition('/')[2]) if content_range else obj.get('ContentLength', 0)
+    return etag, obj.get('LastModified'), file_size
+
+# Helper function to derive a preview's ETag from the object's ETag; a
+# preview is a pure function of the object version and its rendering, and
+# must not share a validator with the object itself. The S3 ETag stays
+# recoverable so revalidations can be forwarded to S3
+def preview_etag(s3_etag, variant):
+    if s3_etag is None:
+        return None
+    return f"{s3_etag}-{quote(variant, safe='')}"
+
+# Helper function for the preview shown instead of files over the size limit
+def too_large_preview(file_size):
+    # Format size for human-readable display
+    size_display = format_file_size(file_size)
+    return jsonify({
+        'type': 'too_large',
+        'preview': f'This file is {size_display}, which exceeds the preview size limit.',
+        'size': file_size
+    })
+
+# Helper function to let clients revalidate responses derived from an object;
+# ETags are weak so flask-compress does not suffix them with the encoding,
+# which would stop the early 304 checks from ever matching
+def set_cache_headers(response, etag, last_modified):
+    if etag:
+        response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    return response
+
+# Helper function to fetch one page of a folder listing from S3, or every
+# page when fetch_all is set; with folders_only the page holds sub-folders
+# only and the files S3 returns alongside them are skipped
+def fetch_list_page(s3_client, bucket, prefix, continuation_token=None, page_size=LIST_PAGE_SIZE, fetch_all=False, folders_only=False):
+    # Set up listing parameters
+    list_params = {
+        'Bucket': bucket,
+        'Prefix': prefix,
+        'Delimiter': '/'
+    }
+    
+    # Add continuation token if provided
+    if continuation_token:
+        list_params['ContinuationToken'] = continuation_token
+    
+    if fetch_all:
+        # Let the paginator follow every continuation token
+        paginator = s3_client.get_paginator('list_objects_v2')
+        responses = paginator.paginate(PaginationConfig={'PageSize': page_size}, **list_params)
+    else:
+        # One ListObjectsV2 call per page, so a page never holds more than
+        # page_size keys and keyCount stays within maxKeys
+        responses = [s3_client.list_objects_v2(MaxKeys=page_size, **list_params)]
+    
+    # Extract folders and files from the S3 responses
+    folders = []
+    files = []
+    key_count = 0
+    response = {}
+    
+    for response in responses:
+        key_count += response.get('KeyCount', 0)
+        
+        for item in response.get('CommonPrefixes', []):
+            folder_name = item['Prefix'].rstrip('/').rpartition('/')[2] + '/'
+            folders.append({
+                'name': folder_name,
+                'path': item['Prefix'],
+                'type': 'folder'
+            })
+        
+        # S3 cannot omit Contents from a delimited listing (MaxKeys counts
+        # folders too), but the per-file work can still be avoided
+        for item in [] if folders_only else response.get('Contents', []):
+            # Skip if this key is the prefix itself or if it represents a folder
+            if item['Key'] == prefix or item['Key'].endswith('/'):
+                continue
+            
+            files.append(build_file_entry(item))
+    
+    # Collect S3 response information for pagination
+    result = {
+        'currentPrefix': prefix,
+        'folders': folders,
+        'files': files
+    }
+    
+    # Add total item count info from S3
+    # KeyCount includes both files and folders
+    result['keyCount'] = key_count
+    
+    # Also pass the total found count if available (may not be fully accurate for large buckets)
+    if 'MaxKeys' in response:
+        result['maxKeys'] = response['MaxKeys']
+    
+    # Add continuation token if more results exist
+    if response.get('IsTruncated'):
+        result['continuationToken'] = response.get('NextContinuationToken')
+        result['isTruncated'] = True
+    
+    return result
+
+# Helper function to fetch a listing page in the background and store it in
+# the listing cache; skipped if the page is already cached or being fetched
+def prefetch_list_page(s3_client, bucket, prefix, continuation_token, page_size=LIST_PAGE_SIZE, folders_only=False):
+    cache_key = (s3_client.meta.endpoint_url, bucket, prefix, continuation_token, page_size, False, folders_only)
+    
+    with list_cache_lock:
+        if cache_key in list_cache or cache_key in list_prefetches:
+            return
+        
+        def fetch():
+            try:
+                result = fetch_list_page(s3_client, bucket, prefix, continuation_token, page_size, folders_only=folders_only)
+                with list_cache_lock:
+                    list_cache[cache_key] = result
+                return result
+            finally:
+                with list_cache_lock:
+                    list_prefetches.pop(cache_key, None)
+        
+        list_prefetches[cache_key] = prefetch_executor.submit(fetch)
+
+# Helper function to build the JSON entry for an object from a listing
+def build_file_entry(item):
+    file_name = item['Key'].rpartition('/')[2]
+    file_ext = get_extension(file_name)
+    
+    return {
+        'name': file_name,
+        'path': item['Key'],
+        'size': item['Size'],
+        'lastModified': item['LastModified'],
+        'type': 'file',
+        'extension': file_ext,
+        'supported': is_supported_type(file_ext, item['Size']),
+        'etag': item.get('ETag', '').strip('"'),
+        'storageClass': item.get('StorageClass')
+    }
+
+# Helper function to list every file below a prefix (no delimiter)
+def list_prefix_files(s3_client, bucket, prefix):
+    paginator = s3_client.get_paginator('list_objects_v2')
+    files = []
+    
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        files.extend(
+            build_file_entry(item) for item in page.get('Contents', [])
+            if not item['Key'].endswith('/')
+        )
+    
+    return files
+
+# Helper function to mark a response as a download with the given file name
+def set_attachment_filename(response, file_name):
+    try:
+        file_name.encode('ascii')
+        response.headers.set('Content-Disposition', 'attachment', filename=file_name)
+    except UnicodeEncodeError:
+        # Non-ASCII names need the RFC 5987 encoded form
+        response.headers.set(
+            'Content-Disposition',
+            'attachment',
+            filename=unicodedata.normalize('NFKD', file_name).encode('ascii', 'ignore').decode('ascii'),
+            **{'filename*': f"UTF-8''{quote(file_name, safe='')}"}
+        )
+
 # Helper function to format file size
 def format_file_size(bytes):
     if bytes == 0:
@@ -373,5 +877,6 @@ def format_file_size(bytes):
     else:
         return f"{int(bytes)} {units[i]}"
 
+# Development server only; production runs under gunicorn via wsgi.py (see gunicorn.conf.py)
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
\ No newline at end of file
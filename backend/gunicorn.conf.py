@@ -0,0 +1,21 @@
+# Gunicorn settings for serving the API in production
+#
+# A single worker process is used because the bucket configuration, S3
+# clients and preview cache all live in process memory. Concurrency comes
+# from gevent instead: requests run as greenlets and yield while waiting
+# on S3, so one worker can overlap many slow S3 calls. Load the app through
+# wsgi.py, which applies the gevent monkey patches first.
+
+bind = '0.0.0.0:5000'
+worker_class = 'gevent'
+workers = 1
+worker_connections = 1000
+
+# Keep client connections from nginx open between requests
+keepalive = 75
+
+# Keep worker heartbeats off the (possibly slow) container filesystem
+worker_tmp_dir = '/dev/shm'
+
+# Match the nginx proxy timeouts so long downloads are not cut off
+timeout = 300
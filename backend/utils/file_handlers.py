@@ -1,11 +1,13 @@
 import os
 import csv
+import pybase64
+import io
 import json
-import base64
-import pandas as pd
-import xml.dom.minidom
-from PIL import Image
+import itertools
+import openpyxl
+from PIL import Image, features
 from docx import Document
+from lxml import etree
 
 SUPPORTED_TYPES = {
     "text": ["txt", "md", "json", "csv", "xml", "html", "css", "js", "py", "r"],
@@ -15,6 +17,33 @@ SUPPORTED_TYPES = {
     "other": [],
 }
 
+# Flat extension -> category lookup built once from SUPPORTED_TYPES
+EXT_TO_CATEGORY = {
+    extension: category
+    for category, extensions in SUPPORTED_TYPES.items()
+    for extension in extensions
+}
+
+# Archives are recognized but cannot be previewed
+_ARCHIVE = frozenset(SUPPORTED_TYPES["archive"])
+
+# Delimiters recognized when previewing CSV files
+CSV_DELIMITERS = ",;\t|"
+
+# Image previews are encoded as WebP when Pillow was built with it
+_WEBP_SUPPORTED = features.check("webp")
+
+# Resampling filter used to shrink image previews
+_RESAMPLE = Image.LANCZOS
+
+# MIME type of the thumbnails produced by render_image_preview
+PREVIEW_IMAGE_MIME = "image/webp" if _WEBP_SUPPORTED else "image/png"
+
+# XML parser for previews; entities and network access stay disabled
+_XML_PARSER = etree.XMLParser(
+    remove_blank_text=True, resolve_entities=False, no_network=True
+)
+
 
 def is_supported_type(extension, size=None):
     """Check if file extension is supported for preview
@@ -33,41 +62,71 @@ def is_supported_type(extension, size=None):
         if size > MAX_SIZE:
             return False
 
-    # Check if it's an archive file (recognized but not previewable)
-    if extension.lower() in SUPPORTED_TYPES["archive"]:
-        return False
+    extension = extension.lower()
+    return extension not in _ARCHIVE and extension in EXT_TO_CATEGORY
 
-    # Check file extension
-    for category, extensions in SUPPORTED_TYPES.items():
-        if extension.lower() in extensions:
-            return True
 
-    return False
+def get_extension(file_name):
+    """Get the lower-cased extension of a file name without the dot
+
+    Equivalent to os.path.splitext(file_name)[1].lower()[1:] but avoids
+    building the intermediate tuple and slices.
+
+    Args:
+        file_name (str): File name without any directory part
+
+    Returns:
+        str: The extension, or an empty string if there is none
+    """
+    base, dot, extension = file_name.rpartition(".")
+    # Leading dots (e.g. ".bashrc") do not start an extension
+    if not dot or not base.strip("."):
+        return ""
+    return extension.lower()
 
 
 def get_file_type(extension):
     """Get the file type category"""
-    extension = extension.lower() if extension else ""
-    for category, extensions in SUPPORTED_TYPES.items():
-        if extension in extensions:
-            return category
-    return "other"
+    return EXT_TO_CATEGORY.get(extension.lower() if extension else "", "other")
+
+
+def _as_file(source):
+    """Wrap in-memory file contents in a file object; paths pass through"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
 
+def _open_text(source, **kwargs):
+    """Open a path or in-memory file contents for reading as UTF-8 text"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.TextIOWrapper(io.BytesIO(source), encoding="utf-8", **kwargs)
+    return open(source, "r", encoding="utf-8", **kwargs)
 
-def get_file_preview(file_path, extension):
-    """Generate preview data based on file type"""
+
+def get_file_preview(source, extension):
+    """Generate preview data based on file type
+
+    Args:
+        source (str or bytes): Path to a local file, or the file contents
+            already held in memory
+        extension (str): File extension without the dot
+
+    Returns:
+        dict: Preview payload for the frontend viewers
+    """
     file_type = get_file_type(extension)
 
     try:
         if file_type == "text":
-            return get_text_preview(file_path, extension)
+            return get_text_preview(source, extension)
         elif file_type == "image":
-            return get_image_preview(file_path, extension)
+            return get_image_preview(source, extension)
         elif file_type == "document":
             if extension == "docx":
-                return get_docx_preview(file_path)
+                return get_docx_preview(source)
             elif extension == "xlsx":
-                return get_xlsx_preview(file_path)
+                return get_xlsx_preview(source)
             elif extension == "pdf":
                 return {"type": "pdf", "preview": "PDF preview not available"}
         elif file_type == "archive":
@@ -86,63 +145,63 @@ def get_file_preview(file_path, extension):
         return {"type": "error", "preview": f"Error generating preview: {str(e)}"}
 
 
-def get_text_preview(file_path, extension):
+def get_text_preview(source, extension):
     """Get preview for text-based files"""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
+        with _open_text(source) as f:
             content = f.read(10000)  # Limit preview size
 
         if extension == "json":
-            # Format JSON for better display
-            try:
-                parsed = json.loads(content)
-                content = json.dumps(parsed, indent=2)
-            except:
-                pass
+            # Format JSON for better display; content that cannot be a JSON
+            # document is shown as-is without attempting a parse
+            if content.lstrip()[:1] in ("{", "["):
+                try:
+                    parsed = json.loads(content)
+                    content = json.dumps(parsed, indent=2, ensure_ascii=False)
+                except (json.JSONDecodeError, RecursionError):
+                    pass
             
         elif extension == 'csv':
-            # Convert CSV to formatted table data
+            # Convert CSV to formatted table data, unless the start of the file
+            # has no delimiter at all, in which case it is shown as plain text
+            head = content[:4096]
+            if not any(delimiter in head for delimiter in CSV_DELIMITERS):
+                return {
+                    'type': 'text',
+                    'preview': content,
+                    'extension': 'txt'
+                }
+            
             try:
-                # Try reading with pandas first
+                # Detect the delimiter and quoting from the same sample
                 try:
-                    df = pd.read_csv(file_path, nrows=100)
-                    return {
-                        'type': 'csv',
-                        'preview': {
-                            'columns': df.columns.tolist(),
-                            'data': df.head(100).values.tolist()
-                        }
-                    }
-                except Exception as csv_err:
-                    print(f"Error using pandas to read CSV: {str(csv_err)}")
-                    
-                    # Fall back to manual CSV processing with csv module
-                    import csv
-                    rows = []
-                    columns = []
-                    
-                    with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
-                        reader = csv.reader(csvfile)
-                        for i, row in enumerate(reader):
-                            if i == 0:
-                                columns = row
-                            else:
-                                rows.append(row)
-                            if i >= 100:  # Limit to 100 rows
-                                break
-                    
-                    return {
-                        'type': 'csv',
-                        'preview': {
-                            'columns': columns,
-                            'data': rows
-                        }
+                    dialect = csv.Sniffer().sniff(head, delimiters=CSV_DELIMITERS)
+                except csv.Error:
+                    dialect = csv.excel
+                
+                rows = []
+                columns = []
+                
+                with _open_text(source, newline='') as csvfile:
+                    reader = csv.reader(csvfile, dialect)
+                    for i, row in enumerate(reader):
+                        if i == 0:
+                            columns = row
+                        else:
+                            rows.append(row)
+                        if i >= 100:  # Limit to 100 rows
+                            break
+                
+                return {
+                    'type': 'csv',
+                    'preview': {
+                        'columns': columns,
+                        'data': rows
                     }
+                }
             except Exception as e:
                 print(f"Error processing CSV file: {str(e)}")
-                # If all else fails, just return as text
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read(10000)
+                # If all else fails, just return the text already read
                 return {
                     'type': 'text',
                     'preview': content,
@@ -150,12 +209,14 @@ def get_text_preview(file_path, extension):
                 }
 
         elif extension == "xml":
-            # Format XML for better display
-            try:
-                dom = xml.dom.minidom.parse(file_path)
-                content = dom.toprettyxml()
-            except:
-                pass
+            # Format XML for better display; content that does not start with
+            # markup (after any BOM) is shown as-is without attempting a parse
+            if content.lstrip("\ufeff \t\r\n")[:1] == "<":
+                try:
+                    tree = etree.parse(_as_file(source), _XML_PARSER)
+                    content = etree.tostring(tree, pretty_print=True, encoding="unicode")[:10000]
+                except etree.LxmlError:
+                    pass
 
         return {"type": "text", "preview": content, "extension": extension}
 
@@ -168,65 +229,85 @@ def get_text_preview(file_path, extension):
 
 
 # Improved get_image_preview function with better error handling for TIF files
-def get_image_preview(file_path, extension):
-    """Get preview for image files"""
-    try:
-        # Special handling for TIF/TIFF files
-        if extension.lower() in ["tif", "tiff"]:
-            try:
-                with Image.open(file_path) as img:
-                    # Convert TIFF to PNG for web display
-                    # Resize very large images for preview
-                    max_size = (800, 800)
-                    if img.width > max_size[0] or img.height > max_size[1]:
-                        img.thumbnail(max_size, Image.LANCZOS)
-
-                    # Save to bytes as PNG
-                    import io
-
-                    buffer = io.BytesIO()
-                    img.save(buffer, format="PNG")
-                    img_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
-
-                    return {
-                        "type": "image",
-                        "preview": img_str,
-                        "mime": "image/png",  # Always use PNG for TIFFs
-                    }
-            except Exception as e:
-                print(f"Error processing TIF/TIFF file: {str(e)}")
-                return {
-                    "type": "error",
-                    "preview": f"Error processing TIF/TIFF file: {str(e)}",
-                }
-
-        # Regular handling for other image types
-        with Image.open(file_path) as img:
-            # Resize very large images for preview
-            max_size = (800, 800)
-            if img.width > max_size[0] or img.height > max_size[1]:
-                img.thumbnail(max_size, Image.LANCZOS)
+def get_image_preview(source, extension):
+    """Get preview for image files
 
-            # Save to bytes
-            import io
+    Images are normally passed in as bytes and decoded from memory.
+    """
+    is_tiff = extension.lower() in ["tif", "tiff"]
 
-            buffer = io.BytesIO()
-            img.save(buffer, format=img.format or "PNG")
-            img_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    try:
+        img_str = pybase64.b64encode_as_string(render_image_preview(source))
 
+        return {
+            "type": "image",
+            "preview": img_str,
+            "mime": PREVIEW_IMAGE_MIME,
+        }
+    except Exception as e:
+        if is_tiff:
+            print(f"Error processing TIF/TIFF file: {str(e)}")
             return {
-                "type": "image",
-                "preview": img_str,
-                "mime": f'image/{img.format.lower() if img.format else "png"}',
+                "type": "error",
+                "preview": f"Error processing TIF/TIFF file: {str(e)}",
             }
-    except Exception as e:
         return {"type": "error", "preview": f"Error processing image: {str(e)}"}
 
 
-def get_docx_preview(file_path):
+def render_image_preview(source):
+    """Decode an image and re-encode it as a preview thumbnail
+
+    Args:
+        source (str or bytes): Path to a local file, or the file contents
+            already held in memory
+
+    Returns:
+        bytes: The thumbnail, encoded as PREVIEW_IMAGE_MIME
+
+    Raises:
+        Exception: If the image cannot be decoded
+    """
+    with Image.open(_as_file(source)) as img:
+        # Resize very large images for preview
+        max_size = (800, 800)
+
+        # Let libjpeg decode at a reduced DCT scale instead of full size
+        if img.format == "JPEG":
+            img.draft("RGB", (max_size[0] * 2, max_size[1] * 2))
+
+        if img.width > max_size[0] or img.height > max_size[1]:
+            img.thumbnail(max_size, _RESAMPLE)
+
+        # Save to bytes as WebP, which is much smaller than PNG and keeps
+        # transparency; PNG is only used if WebP support is missing
+        buffer = io.BytesIO()
+        if _WEBP_SUPPORTED:
+            _to_8bit(img).save(buffer, format="WEBP", quality=80, method=4)
+        else:
+            img.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+def _to_8bit(img):
+    """Stretch a high-bit-depth greyscale image (e.g. a 16-bit TIFF) to 8 bits
+
+    WebP encoding would otherwise clip values above 255 instead of scaling
+    them. Other modes are returned unchanged.
+    """
+    if img.mode.startswith("I;16"):
+        img = img.convert("I")
+    if img.mode not in ("I", "F"):
+        return img
+
+    low, high = img.getextrema()
+    scale = 255.0 / (high - low) if high > low else 1.0
+    return img.point(lambda value: value * scale - low * scale).convert("L")
+
+
+def get_docx_preview(source):
     """Get preview for DOCX files"""
     try:
-        doc = Document(file_path)
+        doc = Document(_as_file(source))
         content = []
 
         for para in doc.paragraphs:
@@ -240,17 +321,22 @@ def get_docx_preview(file_path):
         return {"type": "error", "preview": f"Error parsing DOCX file: {str(e)}"}
 
 
-def get_xlsx_preview(file_path):
+def get_xlsx_preview(source):
     """Get preview for XLSX files"""
     try:
-        # Read the first sheet with pandas
-        df = pd.read_excel(file_path, sheet_name=0, nrows=100)
+        # Stream the header plus the first 100 rows of the active sheet
+        wb = openpyxl.load_workbook(_as_file(source), read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            rows = [list(row) for row in itertools.islice(ws.iter_rows(values_only=True), 101)]
+        finally:
+            wb.close()
 
         return {
             "type": "xlsx",
             "preview": {
-                "columns": df.columns.tolist(),
-                "data": df.head(100).values.tolist(),
+                "columns": rows[0] if rows else [],
+                "data": rows[1:],
             },
         }
     except Exception as e:
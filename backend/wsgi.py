@@ -0,0 +1,9 @@
+# WSGI entry point for gunicorn's gevent workers
+#
+# Patch the standard library before anything imports boto3, so the sockets
+# used by botocore/urllib3 yield to other requests while waiting on S3.
+from gevent import monkey
+
+monkey.patch_all()
+
+from app import app  # noqa: E402
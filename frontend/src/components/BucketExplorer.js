@@ -13,7 +13,7 @@ function BucketExplorer({ onSelectFile, currentPath, onPathChange }) {
   const [totalPages, setTotalPages] = useState(1); // Start with 1, update as we go
   const [pageTokens, setPageTokens] = useState({ 1: null });
   const [totalItems, setTotalItems] = useState(0);
-  const [itemsPerPage, setItemsPerPage] = useState(500);
+  const [itemsPerPage, setItemsPerPage] = useState(1000);
   const [hasMorePages, setHasMorePages] = useState(false);
 
   // Format file size
@@ -1,15 +1,32 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 
-function ImageViewer({ base64Data, mime }) {
+function ImageViewer({ src, base64Data, mime }) {
+  const [failed, setFailed] = useState(false);
+
+  // Reset the error state when a different image is shown
+  useEffect(() => {
+    setFailed(false);
+  }, [src, base64Data]);
+
+  if (failed) {
+    return (
+      <div className="text-center p-8 text-red-500">
+        <p>Error processing image</p>
+      </div>
+    );
+  }
+
+  // Prefer the raw image URL; base64 payloads are kept for JSON previews
   return (
     <div className="flex justify-center">
-      <img 
-        src={`data:${mime};base64,${base64Data}`} 
-        alt="Preview" 
+      <img
+        src={src || `data:${mime};base64,${base64Data}`}
+        alt="Preview"
         className="max-w-full shadow-lg rounded"
+        onError={() => setFailed(true)}
       />
     </div>
   );
 }
 
-export default ImageViewer;
\ No newline at end of file
+export default ImageViewer;
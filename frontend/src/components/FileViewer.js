@@ -6,6 +6,9 @@ import CsvViewer from './FileTypeHandlers/CsvViewer';
 import DocxViewer from './FileTypeHandlers/DocxViewer';
 import XlsxViewer from './FileTypeHandlers/XlsxViewer';
 
+// Extensions previewed through /api/preview/image
+const IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'tif', 'tiff', 'bmp', 'svg'];
+
 function FileViewer({ file, currentPath }) {
   const [fileData, setFileData] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
@@ -242,18 +245,29 @@ function FileViewer({ file, currentPath }) {
         const endpoint = urlParams.get('endpoint');
         const bucket = urlParams.get('bucket');
 
-        // Build request URL with all necessary parameters
-        let requestUrl = `/api/file?path=${encodeURIComponent(file.path)}&preview=true&size=${file.size || 0}`;
-
-        // Add endpoint and bucket parameters if they exist
+        // Endpoint and bucket parameters, if they exist
+        let targetParams = '';
         if (endpoint) {
-          requestUrl += `&endpoint=${encodeURIComponent(endpoint)}`;
+          targetParams += `&endpoint=${encodeURIComponent(endpoint)}`;
         }
 
         if (bucket) {
-          requestUrl += `&bucket=${encodeURIComponent(bucket)}`;
+          targetParams += `&bucket=${encodeURIComponent(bucket)}`;
         }
 
+        // Images are loaded by the <img> tag straight from the raw preview
+        // endpoint instead of as base64 inside JSON
+        if (IMAGE_EXTENSIONS.includes(fileExt)) {
+          setFileData({
+            type: 'image',
+            src: `/api/preview/image?path=${encodeURIComponent(file.path)}${targetParams}`
+          });
+          return;
+        }
+
+        // Build request URL with all necessary parameters
+        const requestUrl = `/api/file?path=${encodeURIComponent(file.path)}&preview=true&size=${file.size || 0}${targetParams}`;
+
         const response = await axios.get(requestUrl);
         setFileData(response.data);
       } catch (err) {
@@ -465,7 +479,7 @@ function FileViewer({ file, currentPath }) {
             )}
 
             {fileData.type === 'image' && (
-              <ImageViewer base64Data={fileData.preview} mime={fileData.mime} />
+              <ImageViewer src={fileData.src} base64Data={fileData.preview} mime={fileData.mime} />
             )}
 
             {fileData.type === 'csv' && (